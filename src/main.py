@@ -3,24 +3,49 @@ Tiki Product Scraper - Main Application
 """
 import sys
 import os
+import logging
+from logging.handlers import MemoryHandler
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from scraper import TikiScraper
 from config import Config
 
+def setup_logging(config):
+    # Per-ID messages go to a buffered log file so they don't fight the progress bar for stdout
+    file_handler = logging.FileHandler(config.LOG_FILE, encoding="utf-8")
+    file_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger = logging.getLogger("scraper")
+    logger.setLevel(logging.INFO)
+    logger.addHandler(MemoryHandler(1000, flushLevel=logging.ERROR, target=file_handler))
+
+def create_scraper():
+    config = Config()
+    setup_logging(config)
+    return TikiScraper(config)
+
 def main():
-    scraper = TikiScraper(Config())
+    scraper = create_scraper()
     scraper.main()
 
 def retry_only():
-    scraper = TikiScraper(Config())
+    scraper = create_scraper()
     scraper.retry_failed_ids()
 
+def export_only():
+    scraper = create_scraper()
+    scraper.export_json()
+
 def main_threaded():
-    scraper = TikiScraper(Config())
+    scraper = create_scraper()
     scraper.main_threaded()
 
+def main_async():
+    scraper = create_scraper()
+    scraper.main_async()
+
 if __name__ == "__main__":
-    main_threaded()  # Use threading for multiproceesing
+    main_async()     # Use asyncio for high-concurrency fetching
+    #main_threaded() # Use threading for multiproceesing
     #main()          # Use 1 process
     # retry_only()
+    # export_only()  # Convert msgpack output to JSON
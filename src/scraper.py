@@ -1,42 +1,171 @@
-import requests
-import json
+import asyncio
+import collections
+import functools
+import itertools
+import logging
+import mmap
+import multiprocessing
+import re
 import os
+import queue
+import threading
 import time
-from bs4 import BeautifulSoup
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import httpx
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+import msgspec
+import orjson
+from aiolimiter import AsyncLimiter
+from rbloom import Bloom
+from selectolax.lexbor import LexborHTMLParser
+from typing import Any
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from tqdm import tqdm
 
+logger = logging.getLogger("scraper")
+
+# A line holding only an ASCII numeric product ID (surrounding whitespace allowed).
+# Replaces str.isdigit(), which also accepts non-ASCII Unicode digits.
+_ID_LINE = re.compile(rb"^[ \t]*([0-9]+)[ \t\r]*$", re.MULTILINE)
+
+# Chunk files hold length-prefixed MessagePack records so they can be appended and read back as a stream.
+# Each record is [requested product_id, product], since the API's own "id" can differ from what we asked for.
+_MSGPACK_ENCODER = msgspec.msgpack.Encoder()
+_MSGPACK_DECODER = msgspec.msgpack.Decoder()
+
+def _iter_chunk(path):
+    """Yield (product_id, product) for each record of one products_N.msgpack file"""
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(4)
+            if len(header) < 4:
+                return
+            size = int.from_bytes(header, "big")
+            payload = f.read(size)
+            if len(payload) < size:
+                return  # truncated tail of a crashed run
+            product_id, product = _MSGPACK_DECODER.decode(payload)
+            yield product_id, product
+
+class ProductResponse(msgspec.Struct):
+    """The product-detail fields we keep; every other key in the API response is skipped while decoding.
+
+    Fields are typed loosely on purpose: a value whose type drifts upstream is passed through
+    instead of turning the whole product into a decode error.
+    """
+    id: int | str | None = None
+    name: Any = None
+    url_key: Any = None
+    price: Any = None
+    description: Any = ""
+    images: Any = None
+
+def _thumbnails(images):
+    """Non-empty thumbnail URLs, skipping anything that isn't an image object"""
+    if not isinstance(images, list):
+        return []
+    return [img["thumbnail_url"] for img in images if isinstance(img, dict) and img.get("thumbnail_url")]
+
+_PRODUCT_DECODER = msgspec.json.Decoder(ProductResponse)
+
+def clean_description(html):
+    """Strip HTML from a product description (module-level so worker processes can run it)"""
+    if not html:
+        return ""
+    if not isinstance(html, str):
+        html = str(html)
+    # Plain-text descriptions (no tags or entities) don't need parsing
+    if "<" not in html and "&" not in html:
+        return html.strip()
+    return LexborHTMLParser(html).text(separator=" ").strip()
+
+class TokenBucket:
+    """Thread-safe token bucket; take() reserves a slot and returns how long to sleep"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Going negative reserves a future token, so waiting threads don't all fire at once
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0
+            return -self.tokens / self.rate
+
 class TikiScraper:
     def __init__(self, config):
         self.config = config
-        self.session = requests.Session()
+        # HTTP/2 multiplexes all worker requests over a few connections
+        self.session = self._make_client(httpx.Client)
+        self.bucket = TokenBucket(config.REQUESTS_PER_SECOND, config.RATE_BURST)
+
+    def _make_client(self, client_cls):
+        limits = httpx.Limits(max_connections=self.config.HTTP2_CONNECTIONS,
+                              max_keepalive_connections=self.config.HTTP2_CONNECTIONS)
+        # The API is stateless: this jar rejects every cookie, so nothing is stored or sent back
+        cookies = CookieJar(policy=DefaultCookiePolicy(allowed_domains=[]))
+        return client_cls(http2=True, limits=limits, timeout=10.0, headers=self.config.HEADERS,
+                          cookies=cookies)
 
     def load_ids(self):
         if not os.path.exists(self.config.INPUT_FILE):
             print(f"❌ Input file not found: {self.config.INPUT_FILE}")
             return []
 
-        with open(self.config.INPUT_FILE, "r", encoding="utf-8") as f:
-            return [line.strip() for line in f if line.strip().isdigit()]
+        if os.path.getsize(self.config.INPUT_FILE) == 0:
+            return []
+
+        # Scan the mapped file directly instead of building a str per line
+        with open(self.config.INPUT_FILE, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return [m.group(1).decode("ascii") for m in _ID_LINE.finditer(mm)]
 
     def clean_description(self, html):
-        if not html:
-            return ""
-        soup = BeautifulSoup(html, "html.parser")
-        return soup.get_text(separator=" ").strip()
+        return clean_description(html)
+
+    def build_product(self, product, clean=True):
+        """clean=False keeps the raw HTML description for a later cleaning stage"""
+        return {
+            "id": product.id,
+            "name": product.name,
+            "url_key": product.url_key,
+            "price": product.price,
+            "description": clean_description(product.description) if clean else product.description,
+            "images": _thumbnails(product.images)
+        }
 
     def check_duplicates(self, product_ids):
-        seen_ids = set()
+        # Pass 1: a Bloom filter flags every ID that may have been seen before.
+        # Only those candidates (real duplicates + rare false positives) are kept exactly.
+        bloom = Bloom(max(len(product_ids), 1), self.config.DUPLICATE_FPR)
+        candidates = set()
+        for pid in product_ids:
+            if pid in bloom:
+                candidates.add(pid)
+            else:
+                bloom.add(pid)
+
+        # Pass 2: confirm candidates exactly, keeping first-seen order
+        seen_candidates = set()
         unique_ids = []
         duplicates = []
-
         for pid in product_ids:
-            if pid in seen_ids:
-                duplicates.append(pid)
-                print(f"🔄 Duplicate ID found: {pid}")
-            else:
-                seen_ids.add(pid)
-                unique_ids.append(pid)
+            if pid in candidates:
+                if pid in seen_candidates:
+                    duplicates.append(pid)
+                    continue
+                seen_candidates.add(pid)
+            unique_ids.append(pid)
+
+        if duplicates:
+            print(f"🔄 Found {len(duplicates)} duplicate IDs")
 
         return unique_ids, duplicates
 
@@ -44,37 +173,30 @@ class TikiScraper:
 
         def single_fetch(product_id):
             url = self.config.BASE_URL.format(product_id)
-            response = self.session.get(url, headers=self.config.HEADERS, timeout=10)
+            response = self.session.get(url)
 
             if response.status_code == 429:
                 retry_after = int(response.headers.get("Retry-After", 5))
-                print(f"⏳ Rate limit hit for ID {product_id}, waiting {retry_after} seconds")
+                logger.warning(f"Rate limit hit for ID {product_id}, waiting {retry_after} seconds")
                 time.sleep(retry_after)
-                raise requests.exceptions.HTTPError(f"429 Too Many Requests")
+                raise httpx.HTTPError(f"429 Too Many Requests")
 
             if response.status_code != 200:
-                raise requests.exceptions.HTTPError(f"HTTP {response.status_code}")
-
-            data = response.json()
-            return {
-                "id": data.get("id"),
-                "name": data.get("name"),
-                "url_key": data.get("url_key"),
-                "price": data.get("price"),
-                "description": self.clean_description(data.get("description", "")),
-                "images": [img.get("thumbnail_url") for img in data.get("images", []) if img.get("thumbnail_url")]
-            }
+                raise httpx.HTTPError(f"HTTP {response.status_code}")
+
+            product = _PRODUCT_DECODER.decode(response.content)
+            return self.build_product(product)
 
         # Retry
         for attempt in range(1, self.config.MAX_RETRIES + 1):
             try:
                 result = single_fetch(product_id)
                 if attempt > 1:
-                    print(f"✅ Success on retry {attempt} for ID {product_id}")
+                    logger.info(f"Success on retry {attempt} for ID {product_id}")
                 return result
 
             except Exception as e:
-                print(f"❌ Attempt {attempt} failed for ID {product_id}: {e}")
+                logger.warning(f"Attempt {attempt} failed for ID {product_id}: {e}")
 
                 if attempt == self.config.MAX_RETRIES:
                     # Final failure
@@ -89,84 +211,230 @@ class TikiScraper:
                 else:
                     # Wait before retry
                     wait_time = self.config.RETRY_DELAY * attempt
-                    print(f"⏳ Waiting {wait_time} seconds before retry {attempt + 1}")
+                    logger.info(f"Waiting {wait_time} seconds before retry {attempt + 1}")
                     time.sleep(wait_time)
 
         return None
 
-    def save_chunk(self, chunk, index):
-        filename = os.path.join(self.config.OUTPUT_DIR, f"products_{index}.json")
-        with open(filename, "w", encoding="utf-8") as f:
-            json.dump(chunk, f, ensure_ascii=False, indent=2)
-        print(f"✅ Saved {len(chunk)} products to {filename}")
+    def _start_output(self, file_index):
+        """Reset the streaming writer; products go to products_{file_index}.msgpack onwards"""
+        self._file_index = file_index
+        self._count = 0
+        self._out = None
+        # Finished chunk files are flushed and closed off the fetch loop
+        self._closer = ThreadPoolExecutor(max_workers=1)
+        self._pending_closes = []
+
+    def _write_record(self, product_id, record):
+        if self._out is None:
+            filename = os.path.join(self.config.OUTPUT_DIR, f"products_{self._file_index}.msgpack")
+            self._out = open(filename, "wb", buffering=1 << 23)
+        payload = _MSGPACK_ENCODER.encode((product_id, record))
+        self._out.write(len(payload).to_bytes(4, "big"))
+        self._out.write(payload)
+        self._count += 1
+
+        if self._count == self.config.CHUNK_SIZE:
+            self._rotate_file()
+
+    def _rotate_file(self):
+        """Hand the current chunk file to the closer thread; the next record opens a new one"""
+        if self._out is None:
+            return
+        self._pending_closes.append(self._closer.submit(self._close_chunk, self._out, self._count))
+        self._out = None
+        self._file_index += 1
+        self._count = 0
+
+    def _close_chunk(self, out, count):
+        out.close()
+        logger.info(f"Saved {count} products to {out.name}")
+
+    def _writer_loop(self, records, pool):
+        """Clean batches of queued products in the process pool and write them, until a None sentinel"""
+        in_flight = collections.deque()
+        done = False
+        while not done:
+            batch = [records.get()]
+            while len(batch) < self.config.CLEAN_BATCH_SIZE:
+                try:
+                    batch.append(records.get_nowait())
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                done = True
+                batch.pop()
+
+            # After a failure keep draining so producers never block on a full queue
+            if self._writer_error is not None:
+                continue
+            try:
+                if batch:
+                    # map() submits every chunk up front and returns lazily, so each batch is spread
+                    # over all workers and several batches clean while earlier ones are written
+                    chunksize = max(1, len(batch) // self.config.CLEAN_WORKERS)
+                    descriptions = [record["description"] for _, record in batch]
+                    in_flight.append((batch, pool.map(clean_description, descriptions, chunksize=chunksize)))
+
+                # Write the oldest batches first so output keeps queue order
+                while in_flight and (done or len(in_flight) > self.config.CLEAN_BATCHES_IN_FLIGHT):
+                    written, cleaned = in_flight.popleft()
+                    for (product_id, record), description in zip(written, cleaned):
+                        record["description"] = description
+                        self._write_record(product_id, record)
+            except Exception as e:
+                logger.error(f"Writer failed: {type(e).__name__}: {e}")
+                self._writer_error = e
+                in_flight.clear()
+
+    def _finish_output(self):
+        """Close the last chunk file and wait for all pending closes"""
+        self._rotate_file()
+        self._closer.shutdown(wait=True)
+        for future in self._pending_closes:
+            future.result()
 
     def save_duplicates(self, duplicates):
         if duplicates:
-            with open(self.config.DUPLICATE_FILE, "w", encoding="utf-8") as f:
-                f.write("duplicate_product_id\n")
-                for duplicate_id in duplicates:
-                    f.write(f"{duplicate_id}\n")
+            self._write_lines(self.config.DUPLICATE_FILE, "duplicate_product_id", duplicates)
             print(f"🔄 Saved {len(duplicates)} duplicate IDs to {self.config.DUPLICATE_FILE}")
 
-    def retry_failed_ids(self):
+    def save_errors(self, errors, filename, append=False):
+        if errors:
+            self._write_lines(filename, "product_id,status", errors, append)
+            print(f"⚠️ Saved {len(errors)} failed IDs to {filename}")
+
+    def _write_lines(self, filename, header, lines, append=False):
+        append = append and os.path.exists(filename)
+        # One join + one write instead of a write() call per line
+        with open(filename, "a" if append else "w", encoding="utf-8", buffering=1 << 20) as f:
+            if not append:
+                f.write(header + "\n")
+            f.write("\n".join(lines))
+            f.write("\n")
+
+    def _output_files(self):
+        return [f for f in os.listdir(self.config.OUTPUT_DIR)
+                if f.startswith("products_") and f.endswith(".msgpack")]
+
+    def _legacy_files(self):
+        """products_N.json chunks written before output moved to MessagePack"""
+        return [f for f in os.listdir(self.config.OUTPUT_DIR)
+                if f.startswith("products_") and f.endswith(".json")]
+
+    def _next_file_index(self):
+        """Index after the highest existing products_N chunk, so earlier output is never overwritten"""
+        file_numbers = [int(f.split("_")[1].split(".")[0]) for f in self._output_files() + self._legacy_files()]
+        return max(file_numbers, default=0) + 1
+
+    def _read_error_ids(self):
+        error_ids = []
         if not os.path.exists(self.config.ERROR_FILE):
-            print("No error file found to retry")
-            return
-
-        retry_ids = []
+            return error_ids
         with open(self.config.ERROR_FILE, "r", encoding="utf-8") as f:
-            next(f)  # Skip header
+            next(f, None)  # Skip header
             for line in f:
                 if line.strip():
-                    product_id = line.split(",")[0]
-                    retry_ids.append(product_id)
+                    error_ids.append(line.split(",")[0])
+        return error_ids
+
+    def _load_saved_ids(self):
+        """Requested IDs already saved to output/"""
+        saved = set()
+        for name in self._output_files():
+            for product_id, _ in _iter_chunk(os.path.join(self.config.OUTPUT_DIR, name)):
+                saved.add(product_id)
+
+        # Legacy chunks only kept the API's id, which is usually the requested one;
+        # any that differ are simply fetched again
+        for name in self._legacy_files():
+            path = os.path.join(self.config.OUTPUT_DIR, name)
+            try:
+                with open(path, "rb") as f:
+                    products = orjson.loads(f.read())
+            except orjson.JSONDecodeError as e:
+                logger.warning(f"Skipping unreadable legacy output {path}: {e}")
+                continue
+            for product in products:
+                if isinstance(product, dict) and product.get("id") is not None:
+                    saved.add(str(product["id"]))
+        return saved
+
+    def load_completed_ids(self):
+        """IDs already saved to output/ or logged in ERROR_FILE by a previous run"""
+        completed = self._load_saved_ids()
+        completed.update(self._read_error_ids())
+        return completed
+
+    def skip_completed(self, product_ids):
+        completed = self.load_completed_ids()
+        if not completed:
+            return product_ids
+        remaining = [pid for pid in product_ids if pid not in completed]
+        print(f"⏭️ Skipping {len(product_ids) - len(remaining)} IDs completed by a previous run")
+        return remaining
 
-        if not retry_ids:
+    def retry_failed_ids(self):
+        if not os.path.exists(self.config.ERROR_FILE):
+            print("No error file found to retry")
+            return
+
+        # An interrupted retry may already have saved some of them, and the run paths append,
+        # so the same ID can be listed more than once
+        failed_ids = self._read_error_ids()
+        if not failed_ids:
             print("No failed IDs to retry")
             return
 
-        print(f"🔄 Retrying {len(retry_ids)} failed IDs...")
+        saved = self._load_saved_ids()
+        retry_ids = [pid for pid in dict.fromkeys(failed_ids) if pid not in saved]
 
-        products = []
         errors = []
-        file_index = 1
-
-        # if error id successful at retry, check and save it to the next index of products.json
-        existing_files = [f for f in os.listdir(self.config.OUTPUT_DIR) 
-                         if f.startswith("products_") and f.endswith(".json")]
-        if existing_files:
-            file_numbers = [int(f.split("_")[1].split(".")[0]) for f in existing_files]
-            file_index = max(file_numbers) + 1
-
-        for i, pid in enumerate(retry_ids, 1):
-            print(f"🔄 Retrying ID {pid} ({i}/{len(retry_ids)})")
-            product = self.fetch_product_with_retry(pid, errors)
-            if product:
-                products.append(product)
-
-            if len(products) == self.config.CHUNK_SIZE:
-                self.save_chunk(products, file_index)
-                file_index += 1
-                products = []
-
-        if products:
-            self.save_chunk(products, file_index)
+        if retry_ids:
+            print(f"🔄 Retrying {len(retry_ids)} failed IDs...")
 
+            # if error id successful at retry, check and save it to the next index of products.msgpack
+            self._start_output(self._next_file_index())
+            try:
+                for pid in tqdm(retry_ids):
+                    product = self.fetch_product_with_retry(pid, errors)
+                    if product:
+                        self._write_record(pid, product)
+            finally:
+                self._finish_output()
+
+        # ERROR_FILE now lists only the IDs that still fail, so recovered ones are not skipped
+        # or retried again by later runs
         if errors:
-            retry_error_file = self.config.ERROR_FILE.replace(".txt", "_retry.txt")
-            with open(retry_error_file, "w", encoding="utf-8") as f:
-                f.write("product_id,status\n")
-                for line in errors:
-                    f.write(line + "\n")
-            print(f"⚠️ Saved {len(errors)} still-failed IDs to {retry_error_file}")
+            self.save_errors(errors, self.config.ERROR_FILE)
+        else:
+            os.remove(self.config.ERROR_FILE)
+            print(f"✅ All failed IDs recovered, removed {self.config.ERROR_FILE}")
+
+    def export_json(self):
+        """Convert every products_N.msgpack chunk into an indented export_N.json file"""
+        names = sorted(self._output_files(), key=lambda f: int(f.split("_")[1].split(".")[0]))
+        if not names:
+            print("No output files found to export")
+            return
 
-    def main(self):
+        for name in tqdm(names):
+            path = os.path.join(self.config.OUTPUT_DIR, name)
+            products = [product for _, product in _iter_chunk(path)]
+            # Not products_N.json, which would overwrite chunks saved by older versions
+            export_name = name.replace("products_", "export_").replace(".msgpack", ".json")
+            with open(os.path.join(self.config.OUTPUT_DIR, export_name), "wb") as f:
+                f.write(orjson.dumps(products, option=orjson.OPT_INDENT_2))
+        print(f"✅ Exported {len(names)} files to JSON in {self.config.OUTPUT_DIR}")
+
+    def _prepare_ids(self):
+        """Load, dedupe and resume-filter the input IDs; returns (unique_ids, duplicates, ids_to_fetch) or None"""
         print("🚀 Loading product IDs...")
         all_product_ids = self.load_ids()
 
         if not all_product_ids:
             print("❌ No product IDs found. Please check your input file.")
-            return
+            return None
 
         print(f"📊 Loaded {len(all_product_ids)} total IDs")
 
@@ -178,133 +446,255 @@ class TikiScraper:
         # Save duplicates log
         self.save_duplicates(duplicates)
 
-        products = []
+        # Resume: skip IDs saved or logged as failed by a previous run
+        product_ids = self.skip_completed(unique_product_ids)
+
+        return unique_product_ids, duplicates, product_ids
+
+    def _save_run_errors(self, errors):
+        # Appended, since IDs failed in earlier runs were skipped
+        self.save_errors(errors, self.config.ERROR_FILE, append=True)
+
+    def main(self):
+        prepared = self._prepare_ids()
+        if prepared is None:
+            return
+        unique_product_ids, duplicates, product_ids = prepared
+
         errors = []
-        file_index = 1
 
         print("🔍 Starting to fetch products...")
-        for i, pid in enumerate(unique_product_ids, 1):
-            print(f"🔍 Fetching ID {pid} ({i}/{len(unique_product_ids)})")
+        self._start_output(self._next_file_index())
+        for pid in tqdm(product_ids):
             product = self.fetch_product_with_retry(pid, errors)
             if product:
-                products.append(product)
-
-            if len(products) == self.config.CHUNK_SIZE:
-                self.save_chunk(products, file_index)
-                file_index += 1
-                products = []
+                self._write_record(pid, product)
+        self._finish_output()
 
-        if products:
-            self.save_chunk(products, file_index)
-
-        # Save errors
-        if errors:
-            with open(self.config.ERROR_FILE, "w", encoding="utf-8") as f:
-                f.write("product_id,status\n")
-                for line in errors:
-                    f.write(line + "\n")
-            print(f"⚠️ Saved {len(errors)} failed IDs to {self.config.ERROR_FILE}")
+        self._save_run_errors(errors)
 
         print(f"✅ Process completed!")
         print(f"📊 Summary: {len(unique_product_ids)} unique IDs, {len(duplicates)} duplicates, {len(errors)} errors")
 
     def main_threaded(self):
         """Main scraping process with threading"""
-        print("🚀 Loading product IDs...")
-        all_product_ids = self.load_ids()
-
-        if not all_product_ids:
-            print("❌ No product IDs found. Please check your input file.")
+        prepared = self._prepare_ids()
+        if prepared is None:
             return
+        unique_product_ids, duplicates, product_ids = prepared
 
-        print(f"📊 Loaded {len(all_product_ids)} total IDs")
+        errors = []
+        fetched = 0
+
+        print(f"🚀 Starting with {len(product_ids)} IDs using {self.config.MAX_WORKERS} threads...")
+
+        self._start_output(self._next_file_index())
+        # Disk writes run on their own thread so the completion loop only enqueues,
+        # and CPU-bound HTML cleaning runs in worker processes outside the GIL
+        records = queue.Queue(maxsize=2 * self.config.CHUNK_SIZE)
+        pool = self._make_clean_pool()
+        self._writer_error = None
+        writer = threading.Thread(target=self._writer_loop, args=(records, pool), daemon=True)
+        writer.start()
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.config.MAX_WORKERS) as executor:
+                # Submit all tasks and store futures with their corresponding product IDs
+                fetch_product_threaded = self._make_fetcher()
+                future_to_pid = {executor.submit(fetch_product_threaded, pid): pid for pid in product_ids}
+
+                with tqdm(total=len(future_to_pid)) as pbar:
+                    for future in as_completed(future_to_pid):
+                        # Drop our reference so the finished future (and its product) can be freed;
+                        # as_completed already releases its own
+                        pid = future_to_pid.pop(future)
+
+                        # Nothing fetched from here on could be saved, so stop instead of wasting requests;
+                        # unfinished IDs are neither saved nor logged, so the next run picks them up
+                        if self._writer_error is not None:
+                            print(f"❌ Writing output failed ({type(self._writer_error).__name__}: {self._writer_error}), stopping")
+                            executor.shutdown(wait=False, cancel_futures=True)
+                            break
+
+                        try:
+                            result, error = future.result()
+                            if result:
+                                records.put((pid, result))
+                                fetched += 1
+                            if error:
+                                errors.append(error)
+
+                        except Exception as e:
+                            logger.error(f"Crash for ID {pid}: {type(e).__name__}: {e}")
+                            errors.append(f"{pid},ThreadCrash:{type(e).__name__}:{e}")
+
+                        pbar.update(1)
+                        pbar.set_postfix(ok=fetched, err=len(errors), refresh=False)
+        finally:
+            records.put(None)
+            writer.join()
+            pool.shutdown()
+            self._finish_output()
+            self._save_run_errors(errors)
+
+        if self._writer_error is not None:
+            raise self._writer_error
 
-        # Check for duplicates
-        print("🔍 Checking for duplicates...")
-        unique_product_ids, duplicates = self.check_duplicates(all_product_ids)
-        print(f"✨ Found {len(unique_product_ids)} unique IDs")
+        print(f"✅ Process completed!")
+        print(f"📊 Summary: {len(unique_product_ids)} unique IDs, {len(duplicates)} duplicates, {len(errors)} errors")
 
-        # Save duplicates log
-        self.save_duplicates(duplicates)
+    def _make_clean_pool(self):
+        """Process pool for CPU-bound HTML cleaning"""
+        # Workers are started lazily once fetch threads are running; forking a process that is
+        # running threads can deadlock, so they are spawned fresh instead
+        return ProcessPoolExecutor(max_workers=self.config.CLEAN_WORKERS,
+                                   mp_context=multiprocessing.get_context("spawn"))
+
+    def _make_fetcher(self):
+        """Build the threaded fetch function with run-wide constants bound to locals"""
+        url_fmt = self.config.BASE_URL.format
+        session_get = self.session.get
+        take_token = self.bucket.take
+        build_product = functools.partial(self.build_product, clean=False)
+        decode = _PRODUCT_DECODER.decode
+        max_retries = self.config.MAX_RETRIES
+        sleep = time.sleep
+
+        def fetch_product_threaded(product_id):
+            """Fetch product with threading-compatible return format"""
+            url = url_fmt(product_id)
+
+            for attempt in range(1, max_retries + 1):
+                try:
+                    wait = take_token()
+                    if wait:
+                        sleep(wait)
+                    response = session_get(url)
+                    status_code = response.status_code
 
-        products = []
-        errors = []
-        file_index = 1
+                    if status_code == 429:
+                        wait_time = int(response.headers.get("Retry-After", 2))
+                        logger.warning(f"429 Too Many Requests for ID {product_id}, retrying after {wait_time} sec (attempt {attempt})")
+                        sleep(wait_time)
+                        continue
 
-        print(f"🚀 Starting with {len(unique_product_ids)} IDs using {self.config.MAX_WORKERS} threads...")
+                    if status_code != 200:
+                        return None, f"{product_id},{status_code}"
 
-        with ThreadPoolExecutor(max_workers=self.config.MAX_WORKERS) as executor:
-            # Submit all tasks and store futures with their corresponding product IDs
-            future_to_pid = {executor.submit(self.fetch_product_threaded, pid): pid for pid in unique_product_ids}
-            
-            for i, future in enumerate(tqdm(as_completed(future_to_pid), total=len(future_to_pid)), 1):
-                try:
-                    result, error = future.result()
-                    if result:
-                        products.append(result)
-                        print(f"✅ Added product ID {result['id']}")
-                    if error:
-                        errors.append(error)
+                    try:
+                        product = decode(response.content)
+                    except msgspec.DecodeError as e:
+                        return None, f"{product_id},JSONDecodeError:{e}"
 
-                    if len(products) == self.config.CHUNK_SIZE:
-                        self.save_chunk(products, file_index)
-                        file_index += 1
-                        products = []
+                    return build_product(product), None
 
                 except Exception as e:
-                    pid = future_to_pid[future]
-                    print(f"🔥 Crash for ID {pid}: {type(e).__name__}: {e}")
-                    errors.append(f"{pid},ThreadCrash:{type(e).__name__}:{e}")
+                    logger.warning(f"Exception for ID {product_id} on attempt {attempt}: {e}")
+                    sleep(2)
 
-        if products:
-            self.save_chunk(products, file_index)
+            return None, f"{product_id},FailedAfter{max_retries}Retries"
 
-        # Save errors
-        if errors:
-            with open(self.config.ERROR_FILE, "w", encoding="utf-8") as f:
-                f.write("product_id,status\n")
-                for line in errors:
-                    f.write(line + "\n")
-        print(f"⚠️ Saved {len(errors)} failed IDs to {self.config.ERROR_FILE}")
+        return fetch_product_threaded
+
+    def main_async(self):
+        """Main scraping process with asyncio + httpx.AsyncClient"""
+        prepared = self._prepare_ids()
+        if prepared is None:
+            return
+        unique_product_ids, duplicates, product_ids = prepared
+
+        print(f"🚀 Starting with {len(product_ids)} IDs using {self.config.ASYNC_CONCURRENCY} concurrent requests...")
+        errors = []
+        pool = self._make_clean_pool()
+        try:
+            asyncio.run(self._run_async(product_ids, pool, errors))
+        finally:
+            pool.shutdown()
+            # Failures seen before an interrupt are still logged; unfinished IDs are picked up next run
+            self._save_run_errors(errors)
 
         print(f"✅ Process completed!")
         print(f"📊 Summary: {len(unique_product_ids)} unique IDs, {len(duplicates)} duplicates, {len(errors)} errors")
 
-    def fetch_product_threaded(self, product_id):
-        """Fetch product with threading-compatible return format"""
-        import time
-        
-        for attempt in range(1, self.config.MAX_RETRIES + 1):
-            try:
-                time.sleep(self.config.DELAY_BETWEEN_CALLS)
-                url = self.config.BASE_URL.format(product_id)
-                response = self.session.get(url, headers=self.config.HEADERS, timeout=10)
+    async def _run_async(self, product_ids, pool, errors):
+        """Fetch product_ids with a bounded window of tasks, appending failures to errors"""
+        fetched = 0
+        self._start_output(self._next_file_index())
 
-                if response.status_code == 429:
-                    wait_time = int(response.headers.get("Retry-After", 2))
-                    print(f"⏳ 429 Too Many Requests for ID {product_id}, retrying after {wait_time} sec (attempt {attempt})")
-                    time.sleep(wait_time)
-                    continue
+        sem = asyncio.Semaphore(self.config.ASYNC_CONCURRENCY)
+        limiter = AsyncLimiter(self.config.REQUESTS_PER_SECOND, 1)
 
-                if response.status_code != 200:
-                    return None, f"{product_id},{response.status_code}"
+        loop = asyncio.get_running_loop()
 
+        try:
+            async with self._make_client(httpx.AsyncClient) as client:
+                async def fetch(pid):
+                    result, error = await self._fetch_async(client, pid, sem, limiter)
+                    # Clean in the process pool so the event loop keeps serving requests
+                    if result:
+                        result["description"] = await loop.run_in_executor(pool, clean_description, result["description"])
+                    return pid, (result, error)
+
+                # Only a window of tasks exists at a time instead of one per ID; the semaphore
+                # still bounds requests, the extra tasks just keep it saturated
+                window = 2 * self.config.ASYNC_CONCURRENCY
+                remaining = iter(product_ids)
+                pending = set()
                 try:
-                    data = response.json()
-                except Exception as e:
-                    return None, f"{product_id},JSONDecodeError:{e}"
+                    with tqdm(total=len(product_ids)) as pbar:
+                        while True:
+                            pending.update(asyncio.create_task(fetch(pid))
+                                           for pid in itertools.islice(remaining, window - len(pending)))
+                            if not pending:
+                                break
+                            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+                            for task in done:
+                                pid, (result, error) = task.result()
+                                if result:
+                                    self._write_record(pid, result)
+                                    fetched += 1
+                                if error:
+                                    errors.append(error)
+
+                                pbar.update(1)
+                            pbar.set_postfix(ok=fetched, err=len(errors), refresh=False)
+                finally:
+                    # Unfinished IDs are neither saved nor logged, so the next run picks them up
+                    for task in pending:
+                        task.cancel()
+                    await asyncio.gather(*pending, return_exceptions=True)
+        finally:
+            self._finish_output()
+
+    async def _fetch_async(self, client, product_id, sem, limiter):
+        """Fetch product inside the event loop, same return format as the threaded fetcher"""
+        url = self.config.BASE_URL.format(product_id)
+
+        async with sem:
+            for attempt in range(1, self.config.MAX_RETRIES + 1):
+                try:
+                    async with limiter:
+                        response = await client.get(url)
 
-                return {
-                    "id": data.get("id"),
-                    "name": data.get("name"),
-                    "url_key": data.get("url_key"),
-                    "price": data.get("price"),
-                    "description": self.clean_description(data.get("description", "")),
-                    "images": [img.get("thumbnail_url") for img in data.get("images", []) if img.get("thumbnail_url")]
-                }, None
+                    if response.status_code == 429:
+                        wait_time = int(response.headers.get("Retry-After", 2))
+                        logger.warning(f"429 Too Many Requests for ID {product_id}, retrying after {wait_time} sec (attempt {attempt})")
+                        await asyncio.sleep(wait_time)
+                        continue
 
-            except Exception as e:
-                print(f"🔥 Exception for ID {product_id} on attempt {attempt}: {e}")
-                time.sleep(2)
+                    if response.status_code != 200:
+                        return None, f"{product_id},{response.status_code}"
+
+                    try:
+                        product = _PRODUCT_DECODER.decode(response.content)
+                    except msgspec.DecodeError as e:
+                        return None, f"{product_id},JSONDecodeError:{e}"
+
+                    return self.build_product(product, clean=False), None
+
+                except Exception as e:
+                    logger.warning(f"Exception for ID {product_id} on attempt {attempt}: {e}")
+                    await asyncio.sleep(2)
 
         return None, f"{product_id},FailedAfter{self.config.MAX_RETRIES}Retries"
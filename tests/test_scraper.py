@@ -0,0 +1,98 @@
+import os
+import sys
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import msgspec
+import pytest
+
+from scraper import TikiScraper, TokenBucket, _PRODUCT_DECODER
+from config import Config
+
+@pytest.fixture
+def scraper():
+    return TikiScraper(Config())
+
+def test_decode_keeps_product_when_field_types_drift(scraper):
+    body = (b'{"id": "4", "name": 5, "url_key": null, "price": "12", "description": null,'
+            b' "images": [{"thumbnail_url": "a.jpg"}, {"thumbnail_url": null}, "b.jpg"],'
+            b' "inventory": {"stock": 1}}')
+
+    product = scraper.build_product(_PRODUCT_DECODER.decode(body))
+
+    assert product == {
+        "id": "4",
+        "name": 5,
+        "url_key": None,
+        "price": "12",
+        "description": "",
+        "images": ["a.jpg"],
+    }
+
+def test_decode_ignores_non_list_images_and_cleans_html(scraper):
+    body = b'{"id": 1, "price": 150000, "description": "<p>a &amp; b</p>", "images": {"thumbnail_url": "x"}}'
+
+    product = scraper.build_product(_PRODUCT_DECODER.decode(body))
+
+    assert product["price"] == 150000
+    assert product["description"] == "a & b"
+    assert product["images"] == []
+
+def test_decode_rejects_body_that_is_not_a_product_object():
+    with pytest.raises(msgspec.DecodeError):
+        _PRODUCT_DECODER.decode(b'{"id": 1, "name": "trunc')
+    with pytest.raises(msgspec.DecodeError):
+        _PRODUCT_DECODER.decode(b'[1, 2, 3]')
+
+def test_resume_matches_requested_id_not_api_id(scraper, tmp_path):
+    scraper.config.OUTPUT_DIR = str(tmp_path)
+    scraper.config.ERROR_FILE = str(tmp_path / "Error.txt")
+    scraper._start_output(scraper._next_file_index())
+    scraper._write_record("7", {"id": 70, "name": "parent SKU"})
+    scraper._write_record("8", {"id": None, "name": "no id"})
+    scraper._finish_output()
+
+    assert scraper.skip_completed(["7", "8", "9"]) == ["9"]
+
+def _set_based_duplicates(product_ids):
+    seen = set()
+    unique_ids = []
+    duplicates = []
+    for pid in product_ids:
+        if pid in seen:
+            duplicates.append(pid)
+        else:
+            seen.add(pid)
+            unique_ids.append(pid)
+    return unique_ids, duplicates
+
+@pytest.mark.parametrize("product_ids", [
+    [],
+    ["1"],
+    ["3", "1", "3", "2", "1", "3", "4"],
+    [str(i % 500) for i in range(5000)],
+])
+def test_check_duplicates_matches_set_based_order(scraper, product_ids):
+    assert scraper.check_duplicates(product_ids) == _set_based_duplicates(product_ids)
+
+def test_token_bucket_reserves_future_tokens(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    bucket = TokenBucket(rate=10, burst=2)
+
+    # The burst is free, then each caller waits one more token interval than the last
+    assert [bucket.take() for _ in range(4)] == pytest.approx([0, 0, 0.1, 0.2])
+
+    # A long idle period refills only up to the burst
+    now[0] += 10
+    assert [bucket.take() for _ in range(3)] == pytest.approx([0, 0, 0.1])
+
+def test_load_ids_keeps_only_ascii_numeric_lines(scraper, tmp_path):
+    input_file = tmp_path / "ids.csv"
+    scraper.config.INPUT_FILE = str(input_file)
+    input_file.write_bytes("product_id\n 12 \n34\r\nabc\n\u0663\n5x\n\n\t78".encode("utf-8"))
+
+    assert scraper.load_ids() == ["12", "34", "78"]
+
+    input_file.write_bytes(b"")
+    assert scraper.load_ids() == []